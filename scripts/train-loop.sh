@@ -62,6 +62,7 @@ else
 
   # Save imitation checkpoint (never overwritten by self-play)
   cp "$MODELS_DIR/latest_weights.json" "$MODELS_DIR/imitation_checkpoint.json"
+  cp "$MODELS_DIR/latest_weights.bin" "$MODELS_DIR/imitation_checkpoint.bin"
   log "  Saved imitation checkpoint: imitation_checkpoint.json"
 
   log "=== Phase 1 complete! ==="
@@ -142,6 +143,7 @@ for iter in $(seq $START_ITER $MAX_ITER); do
   # Step 5: Checkpoint every 200 iterations
   if (( iter % 200 == 0 )); then
     cp "$MODELS_DIR/latest_weights.json" "$MODELS_DIR/checkpoint_iter_${iter}.json"
+    cp "$MODELS_DIR/latest_weights.bin" "$MODELS_DIR/checkpoint_iter_${iter}.bin"
     log "  Saved checkpoint: checkpoint_iter_${iter}.json"
   fi
 
@@ -18,15 +18,41 @@ import * as fs from 'fs';
 // Math ops (must match network-adapter.ts exactly)
 // ============================================================================
 
-function matmul(input: Float32Array, kernel: number[][], bias: number[]): Float32Array {
-  const inSize = kernel.length;
-  const outSize = kernel[0].length;
-  const output = new Float32Array(outSize);
-  for (let j = 0; j < outSize; j++) {
-    let sum = bias[j];
-    for (let i = 0; i < inSize; i++) sum += input[i] * kernel[i][j];
-    output[j] = sum;
+function dotRows(input: Float32Array, kernel: Float32Array | Int8Array, outSize: number, outIn: boolean): Float64Array {
+  const inSize = kernel.length / outSize;
+  const sums = new Float64Array(outSize);
+  if (outIn) {
+    for (let j = 0; j < outSize; j++) {
+      const row = j * inSize;
+      let sum = 0;
+      for (let i = 0; i < inSize; i++) sum += input[i] * kernel[row + i];
+      sums[j] = sum;
+    }
+    return sums;
+  }
+  for (let i = 0; i < inSize; i++) {
+    const x = input[i];
+    if (x === 0) continue;
+    const row = i * outSize;
+    for (let j = 0; j < outSize; j++) sums[j] += x * kernel[row + j];
   }
+  return sums;
+}
+
+function matmul(input: Float32Array, kernel: Float32Array, bias: Float32Array, outIn: boolean): Float32Array {
+  const sums = dotRows(input, kernel, bias.length, outIn);
+  const output = new Float32Array(bias.length);
+  for (let j = 0; j < bias.length; j++) output[j] = sums[j] + bias[j];
+  return output;
+}
+
+function matmulInt8(
+  input: Float32Array, kernel: Int8Array, scale: Float32Array, bias: Float32Array, outIn: boolean,
+): Float32Array {
+  const outSize = bias.length;
+  const sums = dotRows(input, kernel, outSize, outIn);
+  const output = new Float32Array(outSize);
+  for (let j = 0; j < outSize; j++) output[j] = sums[j] * scale[j] + bias[j];
   return output;
 }
 
@@ -36,7 +62,7 @@ function relu(x: Float32Array): Float32Array {
   return out;
 }
 
-function layerNorm(x: Float32Array, gamma: number[], beta: number[]): Float32Array {
+function layerNorm(x: Float32Array, gamma: Float32Array, beta: Float32Array): Float32Array {
   const n = x.length;
   let mean = 0;
   for (let i = 0; i < n; i++) mean += x[i];
@@ -57,10 +83,16 @@ function tanhAct(x: Float32Array): Float32Array {
 }
 
 function runGraph(input: Float32Array, ops: GraphOp[], weights: any): Float32Array {
+  const outIn = weights._meta?.layout === 'out_in';
   let x = input;
   for (const op of ops) {
     switch (op.op) {
-      case 'linear': x = matmul(x, weights[op.key!].kernel, weights[op.key!].bias); break;
+      case 'linear': x = matmul(x, weights[op.key!].kernel, weights[op.key!].bias, outIn); break;
+      case 'linear_i8': {
+        const w = weights[op.key!];
+        x = matmulInt8(x, w.int8_kernel, w.scale, w.bias, outIn);
+        break;
+      }
       case 'layernorm': x = layerNorm(x, weights[op.key!].gamma, weights[op.key!].beta); break;
       case 'relu': x = relu(x); break;
       case 'tanh': x = tanhAct(x); break;
@@ -10,6 +10,7 @@
  * the exact sequence of operations to execute.
  *
  * Uses raw Float32Array math (no TF.js dependency) for fast synchronous inference.
+ * Tensors arrive as flat Float32Arrays unpacked by weight-loader.ts.
  */
 
 import type { GameState, Action, EncodedGameState } from '../../engine/types.js';
@@ -23,17 +24,23 @@ const STATE_SIZE = 501;
 // ============================================================================
 
 export interface LayerWeights {
-  kernel: number[][];
-  bias: number[];
+  kernel: Float32Array;  // row-major [outSize][inSize], or [inSize][outSize] without _meta.layout
+  bias: Float32Array;
+}
+
+export interface QuantizedLayerWeights {
+  int8_kernel: Int8Array;  // same layout as LayerWeights.kernel
+  scale: Float32Array;     // per output
+  bias: Float32Array;
 }
 
 export interface LayerNormWeights {
-  gamma: number[];
-  beta: number[];
+  gamma: Float32Array;
+  beta: Float32Array;
 }
 
 export interface GraphOp {
-  op: 'linear' | 'layernorm' | 'relu' | 'tanh' | 'gelu';
+  op: 'linear' | 'linear_i8' | 'layernorm' | 'relu' | 'tanh' | 'gelu';
   key?: string;
 }
 
@@ -49,6 +56,8 @@ export interface ModelMeta {
   version: number;
   state_size: number;
   action_size: number;
+  dtype?: string;
+  layout?: 'out_in';  // kernel layout; absent in older exports ([in][out])
   graph: GraphManifest;
 }
 
@@ -61,16 +70,55 @@ export interface ModelWeights {
 // RAW MATH OPERATIONS
 // ============================================================================
 
-function matmul(input: Float32Array, kernel: number[][], bias: number[]): Float32Array {
-  const inSize = kernel.length;
-  const outSize = kernel[0].length;
+/**
+ * Unbiased input · kernel product per output, accumulated in float64.
+ * Either way the kernel is walked row by row (contiguous): an [out][in]
+ * kernel as one dot product per output, an [in][out] kernel as one
+ * scaled row per (nonzero) input.
+ */
+function dotRows(input: Float32Array, kernel: Float32Array | Int8Array, outSize: number, outIn: boolean): Float64Array {
+  const inSize = kernel.length / outSize;
+  const sums = new Float64Array(outSize);
+  if (outIn) {
+    for (let j = 0; j < outSize; j++) {
+      const row = j * inSize;
+      let sum = 0;
+      for (let i = 0; i < inSize; i++) {
+        sum += input[i] * kernel[row + i];
+      }
+      sums[j] = sum;
+    }
+    return sums;
+  }
+  for (let i = 0; i < inSize; i++) {
+    const x = input[i];
+    if (x === 0) continue;
+    const row = i * outSize;
+    for (let j = 0; j < outSize; j++) {
+      sums[j] += x * kernel[row + j];
+    }
+  }
+  return sums;
+}
+
+function matmul(input: Float32Array, kernel: Float32Array, bias: Float32Array, outIn: boolean): Float32Array {
+  const sums = dotRows(input, kernel, bias.length, outIn);
+  const output = new Float32Array(bias.length);
+  for (let j = 0; j < bias.length; j++) {
+    output[j] = sums[j] + bias[j];
+  }
+  return output;
+}
+
+function matmulInt8(
+  input: Float32Array, kernel: Int8Array, scale: Float32Array, bias: Float32Array, outIn: boolean,
+): Float32Array {
+  const outSize = bias.length;
+  const sums = dotRows(input, kernel, outSize, outIn);
+  // Per-output scale applied once after accumulation
   const output = new Float32Array(outSize);
   for (let j = 0; j < outSize; j++) {
-    let sum = bias[j];
-    for (let i = 0; i < inSize; i++) {
-      sum += input[i] * kernel[i][j];
-    }
-    output[j] = sum;
+    output[j] = sums[j] * scale[j] + bias[j];
   }
   return output;
 }
@@ -93,7 +141,7 @@ function gelu(x: Float32Array): Float32Array {
   return out;
 }
 
-function layerNorm(x: Float32Array, gamma: number[], beta: number[]): Float32Array {
+function layerNorm(x: Float32Array, gamma: Float32Array, beta: Float32Array): Float32Array {
   const n = x.length;
   let mean = 0;
   for (let i = 0; i < n; i++) mean += x[i];
@@ -141,12 +189,18 @@ function softmax(scores: number[]): number[] {
  * The ops come from the graph manifest in the weights JSON.
  */
 function runGraph(input: Float32Array, ops: GraphOp[], weights: any): Float32Array {
+  const outIn = weights._meta?.layout === 'out_in';
   let x = input;
   for (const op of ops) {
     switch (op.op) {
       case 'linear':
-        x = matmul(x, weights[op.key!].kernel, weights[op.key!].bias);
+        x = matmul(x, weights[op.key!].kernel, weights[op.key!].bias, outIn);
+        break;
+      case 'linear_i8': {
+        const w = weights[op.key!];
+        x = matmulInt8(x, w.int8_kernel, w.scale, w.bias, outIn);
         break;
+      }
       case 'layernorm':
         x = layerNorm(x, weights[op.key!].gamma, weights[op.key!].beta);
         break;
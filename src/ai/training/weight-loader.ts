@@ -1,19 +1,108 @@
 /**
  * Weight Loader
  *
- * Loads model weights from JSON files exported by Python training.
+ * Loads model weights exported by Python training.
  * Works in both Node.js (fs) and browser (fetch) environments.
+ *
+ * Manifest v3 is a JSON file (graph manifest + {offset, shape} per tensor)
+ * next to a `.bin` blob of little-endian tensors in `_meta.dtype` (float32,
+ * or raw bfloat16/float16 bits); int8-quantized kernels carry their own
+ * `dtype: 'int8'`. Older v2 files hold every tensor inline as nested JSON
+ * lists. Both are unpacked into flat typed arrays for the network adapter.
  */
 
 import type { ModelWeights } from './network-adapter.js';
 
+interface PackedTensor {
+  offset: number;  // byte offset into the .bin blob
+  shape: number[];
+  dtype?: string;  // overrides _meta.dtype (int8 kernels)
+}
+
+/**
+ * Path of the tensor blob that accompanies a weights manifest.
+ */
+export function blobPath(manifestPath: string): string {
+  return manifestPath.replace(/\.json$/, '') + '.bin';
+}
+
+function isPacked(manifest: any): boolean {
+  return (manifest._meta?.version ?? 0) >= 3;
+}
+
+function halfToFloat(h: number): number {
+  const sign = h & 0x8000 ? -1 : 1;
+  const exp = (h >> 10) & 0x1f;
+  const frac = h & 0x3ff;
+  if (exp === 0) return sign * 2 ** -14 * (frac / 1024);
+  if (exp === 0x1f) return frac ? NaN : sign * Infinity;
+  return sign * 2 ** (exp - 15) * (1 + frac / 1024);
+}
+
+/**
+ * Read one tensor out of the blob, widening 16-bit dtypes to float32.
+ */
+function readTensor(blob: ArrayBuffer, t: PackedTensor, dtype: string): Float32Array | Int8Array {
+  const count = t.shape.reduce((a, b) => a * b, 1);
+  const kind = t.dtype ?? dtype;
+  switch (kind) {
+    case 'int8':
+      return new Int8Array(blob, t.offset, count);
+    case 'float32':
+      return new Float32Array(blob, t.offset, count);
+    case 'bfloat16': {
+      // bfloat16 is the top half of a float32
+      const bits = new Uint16Array(blob, t.offset, count);
+      const wide = new Uint32Array(count);
+      for (let i = 0; i < count; i++) wide[i] = bits[i] << 16;
+      return new Float32Array(wide.buffer);
+    }
+    case 'float16': {
+      const bits = new Uint16Array(blob, t.offset, count);
+      const out = new Float32Array(count);
+      for (let i = 0; i < count; i++) out[i] = halfToFloat(bits[i]);
+      return out;
+    }
+    default:
+      throw new Error(`Unsupported weights dtype: ${kind}`);
+  }
+}
+
+/**
+ * Convert a parsed manifest (plus its blob, for v3) into adapter weights.
+ */
+export function unpackWeights(manifest: any, blob?: ArrayBuffer): ModelWeights {
+  if (isPacked(manifest) && !blob) {
+    throw new Error('Weights manifest v3 requires its .bin tensor blob');
+  }
+  const weights: ModelWeights = { _meta: manifest._meta };
+  const dtype: string = manifest._meta?.dtype ?? 'float32';
+  for (const [name, entry] of Object.entries<Record<string, any>>(manifest)) {
+    if (name === '_meta') continue;
+    const layer: Record<string, Float32Array | Int8Array> = {};
+    for (const [field, value] of Object.entries(entry)) {
+      if (isPacked(manifest)) {
+        layer[field] = readTensor(blob!, value as PackedTensor, dtype);
+      } else {
+        layer[field] = new Float32Array((value as any[]).flat());
+      }
+    }
+    weights[name] = layer;
+  }
+  return weights;
+}
+
 /**
- * Load weights from a JSON file (Node.js environment).
+ * Load weights from a manifest file (Node.js environment).
  */
 export async function loadWeightsFromFile(filepath: string): Promise<ModelWeights> {
   const fs = await import('fs');
-  const data = fs.readFileSync(filepath, 'utf-8');
-  return JSON.parse(data) as ModelWeights;
+  const manifest = JSON.parse(fs.readFileSync(filepath, 'utf-8'));
+  if (!isPacked(manifest)) return unpackWeights(manifest);
+  const buf = fs.readFileSync(blobPath(filepath));
+  // Copy into a standalone ArrayBuffer so Float32Array views are aligned
+  const blob = buf.buffer.slice(buf.byteOffset, buf.byteOffset + buf.byteLength) as ArrayBuffer;
+  return unpackWeights(manifest, blob);
 }
 
 /**
@@ -21,7 +110,10 @@ export async function loadWeightsFromFile(filepath: string): Promise<ModelWeight
  */
 export async function loadWeightsFromURL(url: string): Promise<ModelWeights> {
   const response = await fetch(url);
-  return response.json() as Promise<ModelWeights>;
+  const manifest = await response.json();
+  if (!isPacked(manifest)) return unpackWeights(manifest);
+  const blob = await (await fetch(blobPath(url))).arrayBuffer();
+  return unpackWeights(manifest, blob);
 }
 
 /**
@@ -2,41 +2,188 @@
 Policy-Value Network for Pokemon TCG AI (Action-Scoring Architecture)
 
 Architecture:
-  State encoder (policy): 501 → 512 → 256 (MLP with LayerNorm + ReLU)
-  Value state encoder:    501 → 512 → 256 (separate MLP for value head)
+  State encoder: 501 → 512 → 256 (MLP with LayerNorm + ReLU)
   Action encoder: 54 → 128 → 64 (MLP per action)
-  Action scorer: concat(256, 64) = 320 → 128 → 1 (score per action)
+  Action scorer: concat(256, 64) = 320 → 128 → 1 (score per action,
+    first layer split into a per-state and a per-action projection)
   Value head: 256 → 128 → 1 (tanh)
 
 The network scores each legal action using (state, action) pairs.
 Policy = softmax over all action scores for legal actions.
-The value head has its own state encoder to avoid gradient conflict with policy.
+The value head reads a detached copy of the state embedding, so value loss
+never pulls the shared trunk away from the policy (no gradient conflict).
 """
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import json
+import math
+import os
 import numpy as np
 
+try:
+    import triton
+    import triton.language as tl
+except ImportError:  # Triton only ships with CUDA builds of torch
+    triton = None
+
 
 STATE_SIZE = 501
 ACTION_SIZE = 54
 
 
+if triton is not None:
+    @triton.jit
+    def _layernorm_relu_kernel(X, W, B, M, stride, N, eps,
+                               ROWS: tl.constexpr, BLOCK_N: tl.constexpr):
+        """In-place LayerNorm + ReLU over a tile of ROWS rows of X, held in registers."""
+        rows = tl.program_id(0) * ROWS + tl.arange(0, ROWS)
+        cols = tl.arange(0, BLOCK_N)
+        in_row = cols < N
+        mask = (rows[:, None] < M) & in_row[None, :]
+        ptrs = X + rows[:, None] * stride + cols[None, :]
+        x = tl.load(ptrs, mask=mask, other=0.).to(tl.float32)
+        mean = tl.sum(x, axis=1) / N
+        diff = tl.where(mask, x - mean[:, None], 0.)
+        var = tl.sum(diff * diff, axis=1) / N
+        rstd = 1 / tl.sqrt(var + eps)
+        w = tl.load(W + cols, mask=in_row)
+        b = tl.load(B + cols, mask=in_row)
+        y = tl.maximum(diff * rstd[:, None] * w[None, :] + b[None, :], 0.)
+        tl.store(ptrs, y.to(X.dtype.element_ty), mask=mask)
+
+
+@torch.jit.ignore
+def _layernorm_relu_triton(h: torch.Tensor, gamma: torch.Tensor, beta: torch.Tensor,
+                           eps: float) -> torch.Tensor:
+    """Apply LayerNorm + ReLU to the GEMM output h in a single Triton launch."""
+    n = h.shape[-1]
+    rows = h.reshape(-1, n)
+    block_n = triton.next_power_of_2(n)
+    # One row per program is too little work for narrow rows (the 128-wide
+    # action blocks): pack several rows into each program's tile instead.
+    tile_rows = max(1, min(16, 2048 // block_n)) if n <= 128 else 1
+    _layernorm_relu_kernel[(triton.cdiv(rows.shape[0], tile_rows),)](
+        rows, gamma, beta, rows.shape[0], rows.stride(0), n, eps,
+        ROWS=tile_rows, BLOCK_N=block_n,
+    )
+    return h
+
+
+class FusedLinearLayerNormReLU(nn.Module):
+    """Linear → LayerNorm → ReLU as a single block.
+
+    Inference on CUDA runs the LayerNorm + ReLU epilogue as one Triton kernel
+    over the GEMM output, so the hidden activations make one trip to DRAM
+    instead of three. Everywhere else (CPU/MPS, or when autograd needs the
+    graph) it falls back to addmm + layer_norm + in-place relu.
+    """
+
+    def __init__(self, in_features, out_features, eps=1e-5):
+        super().__init__()
+        self.in_features = in_features
+        self.out_features = out_features
+        self.eps = eps
+        self.use_triton = triton is not None
+        self.weight = nn.Parameter(torch.empty(out_features, in_features))
+        self.bias = nn.Parameter(torch.empty(out_features))
+        self.gamma = nn.Parameter(torch.ones(out_features))
+        self.beta = nn.Parameter(torch.zeros(out_features))
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        # Same init as nn.Linear + nn.LayerNorm
+        nn.init.kaiming_uniform_(self.weight, a=math.sqrt(5))
+        bound = 1 / math.sqrt(self.in_features)
+        nn.init.uniform_(self.bias, -bound, bound)
+        nn.init.ones_(self.gamma)
+        nn.init.zeros_(self.beta)
+
+    def norm_relu(self, h):
+        """LayerNorm + ReLU epilogue applied to a pre-activation h."""
+        if self.use_triton and h.is_cuda and not h.requires_grad:
+            return _layernorm_relu_triton(h, self.gamma, self.beta, self.eps)
+        h = F.layer_norm(h, (self.out_features,), self.gamma, self.beta, self.eps)
+        return F.relu_(h)
+
+    def linear(self, x, start: int, end: int, bias: bool):
+        """The block's GEMM restricted to input columns [start, end)."""
+        return F.linear(x, self.weight[:, start:end], self.bias if bias else None)
+
+    def forward(self, x):
+        return self.norm_relu(self.linear(x, 0, self.in_features, True))
+
+    def extra_repr(self):
+        return f'in_features={self.in_features}, out_features={self.out_features}'
+
+
+def _quantize_rows(weight):
+    """Symmetric per-output-channel int8: weight ≈ qweight * scale[:, None]."""
+    weight = weight.detach()
+    # Round the scale to the stored dtype first, so quantization uses the
+    # exact scale that dequantization will
+    scale = (weight.abs().amax(dim=1).float() / 127).to(weight.dtype)
+    scale = scale.clamp(min=torch.finfo(weight.dtype).tiny)  # all-zero rows
+    qweight = torch.round(weight.float() / scale.float()[:, None]).clamp(-127, 127).to(torch.int8)
+    return qweight, scale
+
+
+class Int8Linear(nn.Module):
+    """Inference-only nn.Linear with an int8 weight and per-row scales.
+
+    y = (x @ qweight.T) * scale + bias. The int8 weight is widened to the
+    activation dtype and the per-output-channel scale is applied after the
+    GEMM, so weights take a quarter of the float32 bytes.
+    """
+
+    def __init__(self, linear):
+        super().__init__()
+        self.in_features = linear.in_features
+        self.out_features = linear.out_features
+        qweight, scale = _quantize_rows(linear.weight)
+        self.register_buffer('qweight', qweight)
+        self.register_buffer('scale', scale)
+        self.bias = nn.Parameter(linear.bias.detach().clone(), requires_grad=False)
+
+    def forward(self, x):
+        return torch.addcmul(self.bias, F.linear(x, self.qweight.to(x.dtype)), self.scale)
+
+    def extra_repr(self):
+        return f'in_features={self.in_features}, out_features={self.out_features}'
+
+
+class Int8FusedLinearLayerNormReLU(FusedLinearLayerNormReLU):
+    """FusedLinearLayerNormReLU with its weight quantized like Int8Linear."""
+
+    def __init__(self, block):
+        with torch.device('meta'):  # skip init, every tensor is replaced below
+            super().__init__(block.in_features, block.out_features, block.eps)
+        del self.weight
+        self.use_triton = block.use_triton
+        qweight, scale = _quantize_rows(block.weight)
+        self.register_buffer('qweight', qweight)
+        self.register_buffer('scale', scale)
+        for name in ('bias', 'gamma', 'beta'):
+            setattr(self, name, nn.Parameter(getattr(block, name).detach().clone(),
+                                             requires_grad=False))
+
+    def linear(self, x, start: int, end: int, bias: bool):
+        y = F.linear(x, self.qweight[:, start:end].to(x.dtype)) * self.scale
+        return y + self.bias if bias else y
+
+
 class StateEncoder(nn.Module):
     """Encodes game state into a fixed-size embedding."""
 
     def __init__(self, hidden=512, embed=256):
         super().__init__()
-        self.fc1 = nn.Linear(STATE_SIZE, hidden)
-        self.ln1 = nn.LayerNorm(hidden)
-        self.fc2 = nn.Linear(hidden, embed)
-        self.ln2 = nn.LayerNorm(embed)
+        self.block1 = FusedLinearLayerNormReLU(STATE_SIZE, hidden)
+        self.block2 = FusedLinearLayerNormReLU(hidden, embed)
 
     def forward(self, x):
-        x = F.relu(self.ln1(self.fc1(x)))
-        x = F.relu(self.ln2(self.fc2(x)))
+        x = self.block1(x)
+        x = self.block2(x)
         return x
 
 
@@ -45,28 +192,43 @@ class ActionEncoder(nn.Module):
 
     def __init__(self, hidden=128, embed=64):
         super().__init__()
-        self.fc1 = nn.Linear(ACTION_SIZE, hidden)
-        self.ln1 = nn.LayerNorm(hidden)
+        self.block1 = FusedLinearLayerNormReLU(ACTION_SIZE, hidden)
         self.fc2 = nn.Linear(hidden, embed)
 
     def forward(self, x):
-        x = F.relu(self.ln1(self.fc1(x)))
+        x = self.block1(x)
         x = self.fc2(x)
         return x
 
 
 class ActionScorer(nn.Module):
-    """Scores a (state_embed, action_embed) pair."""
+    """Scores every (state_embed, action_embed) pair of a batch.
+
+    The first layer acts on concat(state, action), which splits as
+    W @ [s; a] + b = W_s @ s + W_a @ a + b. The state half is projected once
+    per batch row and broadcast over actions, so the state embedding is never
+    expanded or concatenated per action. Weights keep the concat layout.
+    """
 
     def __init__(self, state_dim=256, action_dim=64, hidden=128):
         super().__init__()
-        self.fc1 = nn.Linear(state_dim + action_dim, hidden)
-        self.ln1 = nn.LayerNorm(hidden)
+        self.state_dim = state_dim
+        self.block1 = FusedLinearLayerNormReLU(state_dim + action_dim, hidden)
         self.fc2 = nn.Linear(hidden, 1)
 
     def forward(self, state_embed, action_embed):
-        x = torch.cat([state_embed, action_embed], dim=-1)
-        x = F.relu(self.ln1(self.fc1(x)))
+        """
+        Args:
+            state_embed: (batch, state_dim)
+            action_embed: (batch, max_actions, action_dim)
+
+        Returns:
+            scores: (batch, max_actions)
+        """
+        block = self.block1
+        s_proj = block.linear(state_embed, 0, self.state_dim, True)
+        a_proj = block.linear(action_embed, self.state_dim, block.in_features, False)
+        x = block.norm_relu(s_proj.unsqueeze(1) + a_proj)
         x = self.fc2(x)
         return x.squeeze(-1)
 
@@ -80,11 +242,21 @@ class ValueHead(nn.Module):
         self.fc2 = nn.Linear(hidden, 1)
 
     def forward(self, x):
-        x = F.relu(self.fc1(x))
-        x = torch.tanh(self.fc2(x))
+        # Both activations run in place on their linear's fresh output
+        x = F.relu_(self.fc1(x))
+        x = torch.tanh_(self.fc2(x))
         return x.squeeze(-1)
 
 
+@torch.jit.script
+def _masked_softmax(scores: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
+    """Softmax over valid actions; scripted so the mask fuses into the softmax read.
+
+    A large finite fill instead of -inf keeps all-padded rows finite.
+    """
+    return F.softmax(scores.masked_fill(~mask, -1e4), dim=-1)
+
+
 class PolicyValueNetwork(nn.Module):
     """
     Complete policy-value network for Pokemon TCG AI.
@@ -92,232 +264,563 @@ class PolicyValueNetwork(nn.Module):
     Given a state and a set of legal actions, produces:
     - policy: probability distribution over legal actions (via softmax of scores)
     - value: scalar estimate of game outcome [-1, 1]
+
+    Pass dtype=torch.bfloat16 (or float16) to hold weights and activations
+    in half precision for inference; inputs are cast on the way in and
+    get_policy_and_value still returns float32.
+
+    fast_norm=False turns off the Triton LayerNorm + ReLU epilogue (see
+    FusedLinearLayerNormReLU) and always uses the PyTorch ops.
     """
 
-    def __init__(self):
+    def __init__(self, dtype=None, fast_norm=True):
         super().__init__()
         self.state_encoder = StateEncoder()
-        self.value_state_encoder = StateEncoder()  # Separate encoder for value head
         self.action_encoder = ActionEncoder()
         self.action_scorer = ActionScorer()
         self.value_head = ValueHead()
+        self._value_stream = None  # CUDA stream for the value head, made on first use
+        for module in self.modules():
+            if isinstance(module, FusedLinearLayerNormReLU):
+                module.use_triton = fast_norm and triton is not None
+        if dtype is not None:
+            self.to(dtype)
 
     def forward(self, states, action_features, action_mask):
         """
         Args:
             states: (batch, 501) game state features
             action_features: (batch, max_actions, 54) action features, padded
-            action_mask: (batch, max_actions) binary mask, 1=valid, 0=padded
+            action_mask: (batch, max_actions) bool mask, True=valid (a 1/0
+                float mask is also accepted)
 
         Returns:
             policy_logits: (batch, max_actions) raw scores (masked invalid → -inf)
             values: (batch,) value estimates
         """
-        # Encode state for policy: (batch, 256)
-        state_embed = self.state_encoder(states)
-
-        # Encode state for value (separate encoder, no gradient conflict): (batch, 256)
-        value_state_embed = self.value_state_encoder(states)
-
-        # Encode actions: (batch, max_actions, 64)
-        batch_size, max_actions, _ = action_features.shape
-        flat_actions = action_features.reshape(-1, ACTION_SIZE)
-        flat_action_embed = self.action_encoder(flat_actions)
-        action_embed = flat_action_embed.reshape(batch_size, max_actions, -1)
-
-        # Score each action: broadcast state to (batch, max_actions, 256)
-        state_expanded = state_embed.unsqueeze(1).expand(-1, max_actions, -1)
-
-        # Flatten for scorer
-        flat_state = state_expanded.reshape(-1, state_embed.shape[-1])
-        flat_act = action_embed.reshape(-1, action_embed.shape[-1])
-        flat_scores = self.action_scorer(flat_state, flat_act)
-        scores = flat_scores.reshape(batch_size, max_actions)
+        if action_mask.dtype != torch.bool:
+            action_mask = action_mask.to(torch.bool)
+        scores, values = self._score(states, action_features)
 
         # Mask invalid actions to -inf
-        scores = scores.masked_fill(action_mask == 0, float('-inf'))
+        scores = scores.masked_fill(~action_mask, float('-inf'))
+        return scores, values
 
-        # Value from separate state embedding
-        values = self.value_head(value_state_embed)
+    def _score(self, states, action_features):
+        """Unmasked action scores and values: ((batch, max_actions), (batch,))."""
+        # Run in the parameter dtype (float32 unless built with dtype=...)
+        dtype = self.value_head.fc1.bias.dtype
+        states = states.to(dtype)
+        action_features = action_features.to(dtype)
 
+        # Encode state: (batch, 256)
+        state_embed = self.state_encoder(states)
+
+        # Value from the same embedding, detached so only the policy trains
+        # the trunk; on CUDA it runs on a side stream, overlapping the
+        # action branch below
+        value_input = state_embed.detach()
+        overlap = not torch.jit.is_scripting() and states.is_cuda
+        if overlap:
+            values = self._launch_value_head(value_input)
+        else:
+            values = self.value_head(value_input)
+
+        # Encode actions: (batch, max_actions, 64). Linear and LayerNorm
+        # broadcast over the leading dims, so no flatten/unflatten is needed.
+        action_embed = self.action_encoder(action_features)
+
+        # Score each action: (batch, max_actions)
+        scores = self.action_scorer(state_embed, action_embed)
+
+        if overlap:
+            self._join_value_stream()
         return scores, values
 
+    @torch.jit.unused
+    def _launch_value_head(self, value_state_embed):
+        """Queue the value head on the (lazily created) value stream."""
+        if self._value_stream is None:
+            self._value_stream = torch.cuda.Stream(device=value_state_embed.device)
+        main_stream = torch.cuda.current_stream()
+        self._value_stream.wait_stream(main_stream)
+        with torch.cuda.stream(self._value_stream):
+            values = self.value_head(value_state_embed)
+        # Allocated on the value stream but consumed on the main one
+        values.record_stream(main_stream)
+        return values
+
+    @torch.jit.unused
+    def _join_value_stream(self):
+        torch.cuda.current_stream().wait_stream(self._value_stream)
+
+    @torch.jit.export
     def get_policy_and_value(self, states, action_features, action_mask):
-        """Returns softmax policy and value."""
-        scores, values = self.forward(states, action_features, action_mask)
-        policy = F.softmax(scores, dim=-1)
-        return policy, values
+        """Returns softmax policy and value (float32 whatever the model dtype)."""
+        if action_mask.dtype != torch.bool:
+            action_mask = action_mask.to(torch.bool)
+        scores, values = self._score(states, action_features)
+        policy = _masked_softmax(scores.float(), action_mask)
+        return policy, values.float()
 
     def count_parameters(self):
         return sum(p.numel() for p in self.parameters() if p.requires_grad)
 
 
+def compile_for_inference(model):
+    """Compile an eval-mode model for inference.
+
+    TorchScript removes per-op Python dispatch (which dominates for layers
+    this small) and freezing folds the parameters in as constants so the
+    fuser can merge the elementwise LayerNorm/ReLU chains. If scripting
+    fails, fall back to torch.compile, which on CUDA also captures a CUDA
+    graph per input shape.
+
+    The returned module only supports forward / get_policy_and_value; keep
+    the original model for export_weights.
+    """
+    model.eval()
+    try:
+        scripted = torch.jit.script(model)
+        return torch.jit.freeze(scripted, preserved_attrs=['get_policy_and_value'])
+    except Exception as e:
+        print(f'  Note: torch.jit.script failed ({e}), using torch.compile')
+        return torch.compile(model, mode='reduce-overhead', dynamic=True)
+
+
+class GraphedPolicyValue:
+    """get_policy_and_value replayed from captured CUDA graphs (inference only).
+
+    At batch 1 with ~20 actions each kernel is tiny, so a forward is mostly
+    launch overhead; one graph replay replaces all of those launches. A graph
+    is captured lazily per max_actions bucket (powers of two, with the last
+    bucket capped at `max_actions`) over static input buffers of `batch_size` rows. Calls are
+    zero-padded into the bucket and the padding is masked out, so results
+    match the model's own get_policy_and_value. Larger inputs fall back to
+    the model directly.
+
+    `model` can be eager or the output of compile_for_inference, and must
+    already be on `device`.
+    """
+
+    def __init__(self, model, batch_size=1, max_actions=64, device='cuda'):
+        self.model = model.eval()
+        self.batch_size = batch_size
+        self.max_actions = max_actions
+        self.device = torch.device(device)
+        self.pool = torch.cuda.graph_pool_handle()  # shared by all buckets
+        self.graphs = {}
+
+    def _capture(self, num_actions):
+        states = torch.zeros(self.batch_size, STATE_SIZE, device=self.device)
+        actions = torch.zeros(self.batch_size, num_actions, ACTION_SIZE, device=self.device)
+        mask = torch.zeros(self.batch_size, num_actions, dtype=torch.bool, device=self.device)
+
+        with torch.no_grad():
+            # Warm up on a side stream (lazy init, autotuning) before capture
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                for _ in range(3):
+                    self.model.get_policy_and_value(states, actions, mask)
+            torch.cuda.current_stream().wait_stream(stream)
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph, pool=self.pool):
+                outputs = self.model.get_policy_and_value(states, actions, mask)
+        return graph, (states, actions, mask), outputs
+
+    def __call__(self, states, action_features, action_mask):
+        """Same arguments and results as PolicyValueNetwork.get_policy_and_value."""
+        batch, num_actions = action_mask.shape
+        if batch > self.batch_size or num_actions > self.max_actions:
+            return self.model.get_policy_and_value(states, action_features, action_mask)
+
+        bucket = min(1 << max(num_actions - 1, 0).bit_length(), self.max_actions)
+        if bucket not in self.graphs:
+            self.graphs[bucket] = self._capture(bucket)
+        graph, (states_buf, actions_buf, mask_buf), (policy, values) = self.graphs[bucket]
+
+        states_buf.zero_()
+        actions_buf.zero_()
+        mask_buf.zero_()
+        states_buf[:batch].copy_(states)
+        actions_buf[:batch, :num_actions].copy_(action_features)
+        mask_buf[:batch, :num_actions].copy_(action_mask)
+        graph.replay()
+        # Outputs live in the graph's static memory: copy out before the next replay
+        return policy[:batch, :num_actions].clone(), values[:batch].clone()
+
+
+def quantize_int8(model):
+    """Quantize every linear layer to int8 weights in place (inference only).
+
+    nn.Linear becomes Int8Linear and FusedLinearLayerNormReLU becomes
+    Int8FusedLinearLayerNormReLU: per-output-channel absmax / 127 scales,
+    activations stay in the model dtype (W8A16). Biases and LayerNorm
+    parameters are left unquantized. Returns the model.
+    """
+    model.eval()
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if type(child) is FusedLinearLayerNormReLU:
+                setattr(parent, name, Int8FusedLinearLayerNormReLU(child))
+            elif type(child) is nn.Linear:
+                setattr(parent, name, Int8Linear(child))
+    return model
+
+
+def fold_linear_chains(model):
+    """Fold the action encoder's last linear into the scorer in place (inference only).
+
+    action_encoder.fc2 has no activation after it, so the scorer's action
+    projection W_a @ (F2 @ h + b2) collapses to (W_a @ F2) @ h + W_a @ b2.
+    The scorer's first block then reads the 128-d hidden action features
+    directly (its action slice widens from 64 to 128 columns) and the
+    action encoder's fc2 becomes an Identity, removing one GEMM per action.
+
+    Exports of a folded model describe the wider scorer with plain linear
+    ops, so the TS adapter needs no changes; they only load back into a
+    folded model. Run before quantize_int8. Returns the model.
+    """
+    model.eval()
+    fc2 = model.action_encoder.fc2
+    if isinstance(fc2, nn.Identity):
+        return model  # already folded
+    block = model.action_scorer.block1
+    if type(fc2) is not nn.Linear or type(block) is not FusedLinearLayerNormReLU:
+        raise ValueError('fold_linear_chains must run before quantize_int8')
+
+    state_dim = model.action_scorer.state_dim
+    with torch.no_grad():
+        # Compose in float64 so folding adds no rounding of its own
+        w_s = block.weight[:, :state_dim]
+        w_a = block.weight[:, state_dim:].double()
+        w_folded = (w_a @ fc2.weight.double()).to(w_s.dtype)
+        b_folded = (block.bias.double() + w_a @ fc2.bias.double()).to(block.bias.dtype)
+        block.weight = nn.Parameter(torch.cat([w_s, w_folded], dim=1))
+        block.bias = nn.Parameter(b_folded)
+    block.in_features = block.weight.shape[1]
+    model.action_encoder.fc2 = nn.Identity()
+    return model
+
+
+def _linear_op(module):
+    """Manifest op for a linear layer: int8-quantized ones dequantize in TS."""
+    return 'linear_i8' if isinstance(module, (Int8Linear, Int8FusedLinearLayerNormReLU)) else 'linear'
+
+
+# Exported components in manifest order, with the activation applied after
+# each component's final layer (None: the output is left linear).
+_COMPONENT_ACTIVATIONS = {
+    'state_encoder': None,
+    'action_encoder': None,
+    'action_scorer': None,
+    'value_head': 'tanh',
+}
+
+
+def _export_components(model):
+    """Map each manifest component name to the module it is exported from."""
+    return {name: getattr(model, name) for name in _COMPONENT_ACTIVATIONS}
+
+
+def _walk(component, prefix, activation=None):
+    """Describe one component as graph ops plus the layers that own weights.
+
+    Returns (ops, {key: module}). Fused blocks expand to linear, layernorm,
+    relu and a LayerNorm to layernorm, relu. A bare linear feeding a
+    LayerNorm gets no activation of its own; any other bare linear is followed
+    by relu unless it is the component's last layer, which gets `activation`
+    instead.
+    """
+    layers = {
+        f'{prefix}_{name}': module
+        for name, module in component.named_modules()
+        if isinstance(module, (FusedLinearLayerNormReLU, nn.Linear, Int8Linear, nn.LayerNorm))
+    }
+    modules = list(layers.values())
+    ops = []
+    for i, (key, module) in enumerate(layers.items()):
+        last = i == len(modules) - 1
+        if isinstance(module, FusedLinearLayerNormReLU):
+            ops += [{'op': _linear_op(module), 'key': key}, {'op': 'layernorm', 'key': key}, {'op': 'relu'}]
+        elif isinstance(module, nn.LayerNorm):
+            ops += [{'op': 'layernorm', 'key': key}, {'op': 'relu'}]
+        else:
+            ops.append({'op': _linear_op(module), 'key': key})
+            if not last and not isinstance(modules[i + 1], nn.LayerNorm):
+                ops.append({'op': 'relu'})
+        if last and activation is not None:
+            ops.append({'op': activation})
+    return ops, layers
+
+
 def _build_graph_manifest(model):
     """Build a graph manifest describing the forward pass for the TS adapter.
 
     The TS adapter reads this manifest and executes the forward pass generically,
     so changing layer counts/sizes in Python requires no TS code changes.
     """
-    graph = {
-        'state_encoder': [],
-        'value_state_encoder': [],
-        'action_encoder': [],
-        'action_scorer': [],
-        'value_head': [],
+    return {
+        name: _walk(component, name, _COMPONENT_ACTIVATIONS[name])[0]
+        for name, component in _export_components(model).items()
     }
 
-    # Discover layers by iterating named modules
-    for name, module in model.state_encoder.named_modules():
-        if name == '':
-            continue
-        prefix = f'state_encoder_{name}'
-        if isinstance(module, nn.Linear):
-            graph['state_encoder'].append({'op': 'linear', 'key': prefix})
-        elif isinstance(module, nn.LayerNorm):
-            graph['state_encoder'].append({'op': 'layernorm', 'key': prefix})
-            graph['state_encoder'].append({'op': 'relu'})
-
-    for name, module in model.value_state_encoder.named_modules():
-        if name == '':
-            continue
-        prefix = f'value_state_encoder_{name}'
-        if isinstance(module, nn.Linear):
-            graph['value_state_encoder'].append({'op': 'linear', 'key': prefix})
-        elif isinstance(module, nn.LayerNorm):
-            graph['value_state_encoder'].append({'op': 'layernorm', 'key': prefix})
-            graph['value_state_encoder'].append({'op': 'relu'})
-
-    for name, module in model.action_encoder.named_modules():
-        if name == '':
-            continue
-        prefix = f'action_encoder_{name}'
-        if isinstance(module, nn.Linear):
-            graph['action_encoder'].append({'op': 'linear', 'key': prefix})
-        elif isinstance(module, nn.LayerNorm):
-            graph['action_encoder'].append({'op': 'layernorm', 'key': prefix})
-            graph['action_encoder'].append({'op': 'relu'})
-
-    for name, module in model.action_scorer.named_modules():
-        if name == '':
-            continue
-        prefix = f'action_scorer_{name}'
-        if isinstance(module, nn.Linear):
-            graph['action_scorer'].append({'op': 'linear', 'key': prefix})
-        elif isinstance(module, nn.LayerNorm):
-            graph['action_scorer'].append({'op': 'layernorm', 'key': prefix})
-            graph['action_scorer'].append({'op': 'relu'})
-
-    for name, module in model.value_head.named_modules():
-        if name == '':
-            continue
-        prefix = f'value_head_{name}'
-        if isinstance(module, nn.Linear):
-            graph['value_head'].append({'op': 'linear', 'key': prefix})
-            # Last linear in value head gets tanh, others get relu
-            # We'll fix this below
-        elif isinstance(module, nn.LayerNorm):
-            graph['value_head'].append({'op': 'layernorm', 'key': prefix})
 
-    # Fix value head: relu after all but last linear, tanh after last linear
-    vh = graph['value_head']
-    linear_indices = [i for i, op in enumerate(vh) if op['op'] == 'linear']
-    for idx in linear_indices[:-1]:
-        vh.insert(idx + 1, {'op': 'relu'})
-    # Recalculate after insertions
-    linear_indices = [i for i, op in enumerate(vh) if op['op'] == 'linear']
-    vh.append({'op': 'tanh'})
+# torch dtype -> manifest name of the tensors stored in the .bin blob
+_BLOB_DTYPES = {
+    torch.float32: 'float32',
+    torch.bfloat16: 'bfloat16',
+    torch.float16: 'float16',
+    torch.int8: 'int8',  # quantized kernels only (see quantize_int8)
+}
+
+
+def _blob_path(path):
+    """Path of the packed tensor blob that accompanies a weights manifest."""
+    return os.path.splitext(path)[0] + '.bin'
+
+
+def export_onnx(model, path):
+    """Export forward (states, actions, mask) -> (scores, values) to ONNX.
+
+    Batch size and action count are dynamic axes, so one file serves every
+    input shape. The model is exported in eval mode on its current device.
+    Requires the onnx and onnxscript packages.
+    """
+    model.eval()
+    device = model.value_head.fc1.bias.device
+    # Sample sizes > 1 so the exporter does not specialize the dynamic axes
+    states = torch.zeros(2, STATE_SIZE, device=device)
+    actions = torch.zeros(2, 4, ACTION_SIZE, device=device)
+    mask = torch.ones(2, 4, dtype=torch.bool, device=device)
+    torch.onnx.export(
+        model, (states, actions, mask), path,
+        opset_version=18,
+        input_names=['states', 'actions', 'mask'],
+        output_names=['scores', 'values'],
+        dynamic_axes={
+            'states': {0: 'batch'},
+            'actions': {0: 'batch', 1: 'num_actions'},
+            'mask': {0: 'batch', 1: 'num_actions'},
+            'scores': {0: 'batch', 1: 'num_actions'},
+            'values': {0: 'batch'},
+        },
+    )
+    print(f'Exported ONNX model to {path}')
+
+
+def _is_safetensors(path):
+    return path.endswith('.safetensors')
+
+
+def _write_packed(weights, meta, path):
+    """Write the v3 JSON manifest plus its .bin tensor blob."""
+    blob = bytearray()
+
+    def pack(tensor):
+        """Append a tensor to the blob and return its manifest entry."""
+        entry = {'offset': len(blob), 'shape': list(tensor.shape)}
+        if tensor.dtype == torch.int8:
+            entry['dtype'] = 'int8'
+        elif tensor.dtype != torch.float32:
+            tensor = tensor.view(torch.int16)  # raw bf16/fp16 bits
+        blob.extend(tensor.contiguous().numpy().tobytes())
+        blob.extend(bytes(-len(blob) % 8))
+        return entry
+
+    manifest = {'_meta': meta}
+    for name, layer in weights.items():
+        manifest[name] = {field: pack(tensor) for field, tensor in layer.items()}
+
+    blob_path = _blob_path(path)
+    with open(blob_path, 'wb') as f:
+        f.write(blob)
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    return blob_path
+
+
+def _write_safetensors(weights, meta, path):
+    """Write one safetensors file; tensors are named '<layer>.<field>'."""
+    from safetensors.torch import save_file
+
+    tensors = {
+        f'{name}.{field}': tensor.contiguous()
+        for name, layer in weights.items()
+        for field, tensor in layer.items()
+    }
+    save_file(tensors, path, metadata={'_meta': json.dumps(meta)})
+
+
+def export_weights(model, path, dtype=None):
+    """Export model weights + graph manifest for TS inference.
 
-    return graph
+    Writes two files: `path` (JSON: _meta with the graph manifest, plus an
+    {offset, shape} entry per tensor) and `<path stem>.bin` (all tensors
+    contiguous and little-endian, 8-byte aligned). Tensors are stored in
+    `dtype` (default: the model's dtype), recorded as _meta.dtype: float32,
+    or the raw 16-bit patterns for bfloat16/float16. Linear kernels are
+    stored as-is, (out, in) row-major, recorded as _meta.layout 'out_in'
+    (files without a layout hold transposed (in, out) kernels).
 
+    A `.safetensors` path instead writes a single safetensors file with the
+    same tensors (named '<layer>.<field>') and the JSON-encoded _meta in its
+    metadata, for fast mmap loading on the Python side.
 
-def export_weights(model, path):
-    """Export model weights + graph manifest to JSON for TS inference.
+    Layers quantized by quantize_int8 export `int8_kernel` (entry dtype
+    'int8') plus a per-output `scale` instead of `kernel`, and use the
+    'linear_i8' manifest op.
 
     The graph manifest describes the forward pass structure so the TS adapter
     can execute it generically without hardcoded layer names.
     """
     graph = _build_graph_manifest(model)
-
-    weights = {
-        '_meta': {
-            'version': 2,
-            'state_size': STATE_SIZE,
-            'action_size': ACTION_SIZE,
-            'graph': graph,
-        }
+    if dtype is None:
+        dtype = model.value_head.fc1.bias.dtype
+
+    meta = {
+        'version': 3,
+        'state_size': STATE_SIZE,
+        'action_size': ACTION_SIZE,
+        'dtype': _BLOB_DTYPES[dtype],
+        'layout': 'out_in',
+        'graph': graph,
     }
+    weights = {}
+
+    def pack(tensor):
+        tensor = tensor.detach().cpu()
+        return tensor if tensor.dtype == torch.int8 else tensor.to(dtype)
+
+    def pack_kernel(module):
+        if isinstance(module, (Int8Linear, Int8FusedLinearLayerNormReLU)):
+            return {'int8_kernel': pack(module.qweight), 'scale': pack(module.scale)}
+        return {'kernel': pack(module.weight)}
 
     def export_linear(module, name):
         weights[name] = {
-            'kernel': module.weight.detach().cpu().numpy().T.tolist(),
-            'bias': module.bias.detach().cpu().numpy().tolist(),
+            **pack_kernel(module),
+            'bias': pack(module.bias),
         }
 
     def export_layernorm(module, name):
         weights[name] = {
-            'gamma': module.weight.detach().cpu().numpy().tolist(),
-            'beta': module.bias.detach().cpu().numpy().tolist(),
+            'gamma': pack(module.weight),
+            'beta': pack(module.bias),
+        }
+
+    def export_block(module, name):
+        # Linear and LayerNorm params share one key; the manifest reads
+        # kernel/bias for the linear op and gamma/beta for the layernorm op.
+        weights[name] = {
+            **pack_kernel(module),
+            'bias': pack(module.bias),
+            'gamma': pack(module.gamma),
+            'beta': pack(module.beta),
         }
 
     # Export all named submodule weights
-    for component_name in ['state_encoder', 'value_state_encoder', 'action_encoder', 'action_scorer', 'value_head']:
-        component = getattr(model, component_name)
-        for name, module in component.named_modules():
-            if name == '':
-                continue
-            key = f'{component_name}_{name}'
-            if isinstance(module, nn.Linear):
-                export_linear(module, key)
+    for component_name, component in _export_components(model).items():
+        for key, module in _walk(component, component_name)[1].items():
+            if isinstance(module, FusedLinearLayerNormReLU):
+                export_block(module, key)
             elif isinstance(module, nn.LayerNorm):
                 export_layernorm(module, key)
+            else:
+                export_linear(module, key)
 
-    with open(path, 'w') as f:
-        json.dump(weights, f)
-
-    print(f'Exported weights to {path} (graph manifest v2)')
+    if _is_safetensors(path):
+        _write_safetensors(weights, meta, path)
+        print(f'Exported weights to {path} (graph manifest v3)')
+    else:
+        blob_path = _write_packed(weights, meta, path)
+        print(f'Exported weights to {path} + {blob_path} (graph manifest v3)')
 
 
 def load_weights(model, path):
-    """Load weights from JSON (exported by export_weights or Python training)."""
-    with open(path, 'r') as f:
-        weights = json.load(f)
+    """Load weights exported by export_weights.
 
-    def load_linear(module, name):
-        module.weight.data = torch.tensor(
-            np.array(weights[name]['kernel']).T, dtype=torch.float32
-        )
-        module.bias.data = torch.tensor(
-            np.array(weights[name]['bias']), dtype=torch.float32
-        )
-
-    def load_layernorm(module, name):
-        module.weight.data = torch.tensor(
-            np.array(weights[name]['gamma']), dtype=torch.float32
-        )
-        module.bias.data = torch.tensor(
-            np.array(weights[name]['beta']), dtype=torch.float32
-        )
-
-    load_linear(model.state_encoder.fc1, 'state_encoder_fc1')
-    load_layernorm(model.state_encoder.ln1, 'state_encoder_ln1')
-    load_linear(model.state_encoder.fc2, 'state_encoder_fc2')
-    load_layernorm(model.state_encoder.ln2, 'state_encoder_ln2')
-
-    # Value state encoder (tolerate missing for backward compat with old weights)
-    if 'value_state_encoder_fc1' in weights:
-        load_linear(model.value_state_encoder.fc1, 'value_state_encoder_fc1')
-        load_layernorm(model.value_state_encoder.ln1, 'value_state_encoder_ln1')
-        load_linear(model.value_state_encoder.fc2, 'value_state_encoder_fc2')
-        load_layernorm(model.value_state_encoder.ln2, 'value_state_encoder_ln2')
+    `.safetensors` files are memory-mapped; v3 manifests read tensors
+    straight out of the packed .bin blob; older v2 files with nested JSON
+    lists are still accepted.
+    """
+    if _is_safetensors(path):
+        from safetensors import safe_open
+
+        weights = {}
+        with safe_open(path, framework='pt') as f:
+            meta = json.loads(f.metadata()['_meta'])
+            for key in f.keys():
+                name, field = key.rsplit('.', 1)
+                weights.setdefault(name, {})[field] = f.get_tensor(key)
+
+        def tensor(entry):
+            return entry
     else:
-        print('  Note: value_state_encoder not found in weights, using random init')
-
-    load_linear(model.action_encoder.fc1, 'action_encoder_fc1')
-    load_layernorm(model.action_encoder.ln1, 'action_encoder_ln1')
-    load_linear(model.action_encoder.fc2, 'action_encoder_fc2')
+        with open(path, 'r') as f:
+            weights = json.load(f)
+        meta = weights.get('_meta', {})
+
+        if meta.get('version', 0) >= 3:
+            with open(_blob_path(path), 'rb') as f:
+                blob = bytearray(f.read())
+            dtypes = {name: dt for dt, name in _BLOB_DTYPES.items()}
+
+            def tensor(entry):
+                dtype = dtypes[entry.get('dtype', meta.get('dtype', 'float32'))]
+                raw_dtype = {torch.float32: '<f4', torch.int8: '<i1'}.get(dtype, '<i2')
+                count = int(np.prod(entry['shape']))
+                array = np.frombuffer(blob, dtype=raw_dtype, count=count, offset=entry['offset'])
+                return torch.from_numpy(array.reshape(entry['shape'])).view(dtype)
+        else:
+            def tensor(entry):
+                return torch.tensor(np.array(entry), dtype=torch.float32)
+
+    # Kernels were stored transposed, (in, out), before _meta.layout existed
+    transposed = meta.get('layout') != 'out_in'
+
+    def kernel(layer):
+        """A layer's kernel as an (out, in) weight."""
+        if 'int8_kernel' in layer:
+            # int8 exports are dequantized with their per-output scales
+            weight = tensor(layer['int8_kernel']).float()
+            weight = weight.T if transposed else weight
+            return weight * tensor(layer['scale']).float().unsqueeze(1)
+        weight = tensor(layer['kernel'])
+        return weight.T.contiguous() if transposed else weight
+
+    def assign(param, value):
+        # Files in another precision are cast to the model's dtype
+        param.data = value.to(param.dtype)
 
-    load_linear(model.action_scorer.fc1, 'action_scorer_fc1')
-    load_layernorm(model.action_scorer.ln1, 'action_scorer_ln1')
+    def load_linear(module, name):
+        assign(module.weight, kernel(weights[name]))
+        assign(module.bias, tensor(weights[name]['bias']))
+
+    def load_block(module, name):
+        # Older exports store each block as separate fcN / lnN entries
+        linear_w = weights.get(name) or weights[name.replace('block', 'fc')]
+        norm_w = weights.get(name) or weights[name.replace('block', 'ln')]
+        assign(module.weight, kernel(linear_w))
+        assign(module.bias, tensor(linear_w['bias']))
+        assign(module.gamma, tensor(norm_w['gamma']))
+        assign(module.beta, tensor(norm_w['beta']))
+
+    load_block(model.state_encoder.block1, 'state_encoder_block1')
+    load_block(model.state_encoder.block2, 'state_encoder_block2')
+
+    # Older exports carry a separate value state encoder; the value head now
+    # reads the shared trunk, so its weights are ignored
+    if 'value_state_encoder_block1' in weights or 'value_state_encoder_fc1' in weights:
+        print('  Note: ignoring value_state_encoder weights (value head now shares the state encoder)')
+
+    load_block(model.action_encoder.block1, 'action_encoder_block1')
+    if not isinstance(model.action_encoder.fc2, nn.Identity):  # see fold_linear_chains
+        load_linear(model.action_encoder.fc2, 'action_encoder_fc2')
+
+    load_block(model.action_scorer.block1, 'action_scorer_block1')
     load_linear(model.action_scorer.fc2, 'action_scorer_fc2')
 
     load_linear(model.value_head.fc1, 'value_head_fc1')
@@ -338,8 +841,8 @@ if __name__ == '__main__':
     max_actions = 20
     states = torch.randn(batch, STATE_SIZE, device=device)
     actions = torch.randn(batch, max_actions, ACTION_SIZE, device=device)
-    mask = torch.ones(batch, max_actions, device=device)
-    mask[:, 15:] = 0  # mask out last 5 actions
+    mask = torch.ones(batch, max_actions, dtype=torch.bool, device=device)
+    mask[:, 15:] = False  # mask out last 5 actions
 
     scores, values = model(states, actions, mask)
     print(f'Scores shape: {scores.shape}')  # (4, 20)
@@ -347,6 +850,14 @@ if __name__ == '__main__':
     print(f'Sample scores: {scores[0, :5].detach().cpu().numpy()}')
     print(f'Sample value: {values[0].item():.4f}')
 
+    # Unfused Linear → LayerNorm layers must map to the same ops as a fused block
+    unfused = nn.Sequential()
+    unfused.fc1 = nn.Linear(8, 8)
+    unfused.ln1 = nn.LayerNorm(8)
+    unfused.fc2 = nn.Linear(8, 1)
+    ops = [op['op'] for op in _walk(unfused, 'test')[0]]
+    assert ops == ['linear', 'layernorm', 'relu', 'linear'], ops
+
     # Test export
     export_weights(model, 'models/test_weights.json')
     print('Model test passed!')
@@ -96,7 +96,7 @@ def collate_batch(samples, device):
 
     states = torch.zeros(batch_size, STATE_SIZE, device=device)
     action_features = torch.zeros(batch_size, max_actions, ACTION_SIZE, device=device)
-    action_mask = torch.zeros(batch_size, max_actions, device=device)
+    action_mask = torch.zeros(batch_size, max_actions, dtype=torch.bool, device=device)
     policy_targets = torch.zeros(batch_size, max_actions, device=device)
     value_targets = torch.zeros(batch_size, device=device)
 
@@ -104,7 +104,7 @@ def collate_batch(samples, device):
         n = s['num_actions']
         states[i] = torch.from_numpy(s['state'])
         action_features[i, :n] = torch.from_numpy(s['action_features'])
-        action_mask[i, :n] = 1.0
+        action_mask[i, :n] = True
         policy_targets[i, :n] = torch.from_numpy(s['policy_target'])
         value_targets[i] = s['value_target']
 
@@ -137,7 +137,7 @@ def train_epoch(model, optimizer, samples, batch_size, device, entropy_coef=0.01
         # logits are masked to -inf for invalid actions, so log_softmax
         # produces -inf for those positions. Use mask to avoid 0 * -inf = NaN.
         log_probs = F.log_softmax(logits, dim=-1)
-        log_probs_safe = log_probs.masked_fill(mask == 0, 0.0)
+        log_probs_safe = log_probs.masked_fill(~mask, 0.0)
         policy_loss = -(policy_targets * log_probs_safe).sum(dim=-1).mean()
 
         # Value loss: MSE
@@ -145,10 +145,10 @@ def train_epoch(model, optimizer, samples, batch_size, device, entropy_coef=0.01
 
         # Entropy bonus (encourage exploration)
         probs = F.softmax(logits, dim=-1)
-        probs_safe = probs.masked_fill(mask == 0, 0.0)
+        probs_safe = probs.masked_fill(~mask, 0.0)
         entropy = -(probs_safe * log_probs_safe).sum(dim=-1).mean()
 
-        # Total loss (2x value weight: value head has its own encoder now)
+        # Total loss (2x value weight: value loss only trains the value head)
         loss = policy_loss + 2.0 * value_loss - entropy_coef * entropy
 
         optimizer.zero_grad()
@@ -3,6 +3,8 @@ Verify that Python and TypeScript inference produce identical results.
 
 Exports a test case (state + actions + expected outputs) that the TS adapter
 can validate against. This ensures no drift between training and inference.
+When onnx, onnxscript and onnxruntime are installed (optional, not in
+requirements.txt), the ONNX export is cross-checked as well.
 
 Usage: python training/verify_inference.py
 """
@@ -12,14 +14,41 @@ import os
 import numpy as np
 import torch
 
-from model import PolicyValueNetwork, STATE_SIZE, ACTION_SIZE, export_weights
+from model import (
+    PolicyValueNetwork, STATE_SIZE, ACTION_SIZE, compile_for_inference, export_onnx, export_weights,
+)
+
+try:
+    import onnx  # noqa: F401 -- needed by export_onnx
+    import onnxscript  # noqa: F401 -- needed by export_onnx
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+def check_onnx(model, path, state_t, actions_t, mask, scores, values):
+    """Export to ONNX and compare ONNX Runtime against the PyTorch outputs."""
+    export_onnx(model, path)
+    session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+    ort_scores, ort_values = session.run(None, {
+        'states': state_t.numpy(),
+        'actions': actions_t.numpy(),
+        'mask': mask.numpy(),
+    })
+    np.testing.assert_allclose(ort_scores, scores.numpy(), atol=1e-5)
+    np.testing.assert_allclose(ort_values, values.numpy(), atol=1e-5)
+    print('ONNX Runtime matches PyTorch (atol=1e-5)')
 
 
 def main():
+    # Single-threaded for deterministic results and timings
+    torch.set_num_threads(1)
+
     # Create model with fixed seed for reproducibility
     torch.manual_seed(42)
     model = PolicyValueNetwork()
     model.eval()
+    inference_model = compile_for_inference(model)
 
     # Export weights
     os.makedirs('models', exist_ok=True)
@@ -31,13 +60,17 @@ def main():
     num_actions = 5
     actions = np.random.randn(num_actions, ACTION_SIZE).astype(np.float32)
 
-    # Run forward pass
-    with torch.no_grad():
-        state_t = torch.from_numpy(state).unsqueeze(0)
-        actions_t = torch.from_numpy(actions).unsqueeze(0)
-        mask = torch.ones(1, num_actions)
+    # Input buffers, filled in place
+    state_t = torch.empty(1, STATE_SIZE)
+    actions_t = torch.empty(1, num_actions, ACTION_SIZE)
+    mask = torch.ones(1, num_actions, dtype=torch.bool)
+
+    # Run forward pass (inference_mode: no autograd or version-counter tracking)
+    with torch.inference_mode():
+        state_t.copy_(torch.from_numpy(state))
+        actions_t.copy_(torch.from_numpy(actions))
 
-        scores, values = model(state_t, actions_t, mask)
+        scores, values = inference_model(state_t, actions_t, mask)
         policy = torch.softmax(scores, dim=-1)
 
     # Save test case
@@ -52,6 +85,9 @@ def main():
     with open('models/test_case.json', 'w') as f:
         json.dump(test_case, f)
 
+    if onnxruntime is not None:
+        check_onnx(model, 'models/test_model.onnx', state_t, actions_t, mask, scores, values)
+
     print(f'State size: {STATE_SIZE}')
     print(f'Action size: {ACTION_SIZE}')
     print(f'Num actions: {num_actions}')
@@ -59,7 +95,7 @@ def main():
     print(f'Value: {values[0].item():.6f}')
     print(f'Policy: {policy[0].numpy().round(4).tolist()}')
     print(f'\nTest case saved to models/test_case.json')
-    print(f'Weights saved to models/test_weights.json')
+    print(f'Weights saved to models/test_weights.json + models/test_weights.bin')
     print(f'\nRun: node --import tsx scripts/verify-inference.ts')
 
 